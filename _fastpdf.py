@@ -0,0 +1,115 @@
+"""
+Minimal PDF writer for single-page documents drawn with the standard Type 1 fonts.
+
+The standard fonts need no embedding, so every object except the page content
+stream is identical between documents. PageWriter serializes those objects and
+their xref entries once; per document only the content stream and the final
+startxref offset are written.
+"""
+from __future__ import annotations
+
+from io import BytesIO
+
+from reportlab.lib.rl_accel import fp_str
+from reportlab.pdfbase import pdfmetrics
+
+
+FONTS = ("Helvetica", "Helvetica-Bold", "Helvetica-Oblique")
+FONT_NAMES = {font: f"/F{i}" for i, font in enumerate(FONTS, start=1)}
+
+# Load the AFM metrics up front so the first request does not pay for parsing them.
+for _font in FONTS:
+    pdfmetrics.getFont(_font)
+
+
+# Babel uses narrow/thin spaces as group separators (e.g. fr_FR "1\u202f500,00"); WinAnsi has none.
+_SPACES = str.maketrans({"\u202f": " ", "\u2009": " "})
+
+
+def _winansi(text: str) -> str:
+    # Characters outside WinAnsiEncoding cannot be shown with the standard fonts.
+    return text.translate(_SPACES).encode("cp1252", errors="replace").decode("cp1252")
+
+
+def _literal(text: str) -> bytes:
+    raw = text.encode("cp1252")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+class TextBlock:
+    """
+    Collects strings into a single BT ... ET block. Strings are positioned with Tm,
+    and a Tf is only emitted when the font or size differs from the previous string,
+    so callers should add strings grouped by font.
+    """
+
+    def __init__(self):
+        self._ops = [b"BT"]
+        self._font = None
+
+    def add(self, font: str, size: float, x: float, y: float, text: str, right: bool = False) -> None:
+        """Draw `text` at (x, y); with right=True, x is the right edge."""
+        text = _winansi(text)
+        if right:
+            x -= pdfmetrics.stringWidth(text, font, size)
+        if self._font != (font, size):
+            self._font = (font, size)
+            self._ops.append(b"%s %s Tf" % (FONT_NAMES[font].encode("ascii"), fp_str(size).encode("ascii")))
+        self._ops.append(b"1 0 0 1 %s Tm (%s) Tj" % (fp_str(x, y).encode("ascii"), _literal(text)))
+
+    def getvalue(self) -> bytes:
+        return b"\n".join(self._ops) + b"\nET"
+
+
+def line_op(line_width: float, x1: float, y1: float, x2: float, y2: float) -> bytes:
+    return b"%s w n %s m %s l S" % (
+        fp_str(line_width).encode("ascii"),
+        fp_str(x1, y1).encode("ascii"),
+        fp_str(x2, y2).encode("ascii"),
+    )
+
+
+class PageWriter:
+    """Assembles one-page PDFs of a fixed page size from a content stream."""
+
+    def __init__(self, page_size: tuple[float, float]):
+        fonts = b" ".join(
+            b"%s %d 0 R" % (FONT_NAMES[font].encode("ascii"), num)
+            for num, font in enumerate(FONTS, start=4)
+        )
+        content_num = 4 + len(FONTS)
+        objects = [
+            b"<< /Type /Catalog /Pages 2 0 R >>",
+            b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %s] /Resources << /Font << %s >> >> /Contents %d 0 R >>"
+            % (fp_str(*page_size).encode("ascii"), fonts, content_num),
+        ]
+        objects += [
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>" % font.encode("ascii")
+            for font in FONTS
+        ]
+
+        buffer = BytesIO()
+        buffer.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for num, body in enumerate(objects, start=1):
+            offsets.append(buffer.tell())
+            buffer.write(b"%d 0 obj\n%s\nendobj\n" % (num, body))
+        # The content stream is always the last object, so its offset is fixed too.
+        offsets.append(buffer.tell())
+
+        self._prefix = buffer.getvalue()
+        self._content_num = content_num
+        self._trailer = (
+            b"xref\n0 %d\n0000000000 65535 f \n" % (content_num + 1)
+            + b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+            + b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n" % (content_num + 1)
+        )
+
+    def render(self, content: bytes) -> bytes:
+        # Offsets are known up front, so the document is built with one join: no buffer
+        # to allocate or reset, and a single copy of the parts into the result.
+        header = b"%d 0 obj\n<< /Length %d >>\nstream\n" % (self._content_num, len(content))
+        footer = b"\nendstream\nendobj\n"
+        xref_offset = len(self._prefix) + len(header) + len(content) + len(footer)
+        return b"".join((self._prefix, header, content, footer, self._trailer, b"%d\n%%%%EOF\n" % xref_offset))
@@ -1,51 +1,94 @@
 from __future__ import annotations
 
+import asyncio
+import functools
 import hashlib
 import re
-from datetime import datetime, timezone
+import time
+import zipfile
+from datetime import date, datetime, timezone
 from io import BytesIO
+from typing import Annotated
 
-from fastapi import FastAPI
-from fastapi.responses import Response
-from pydantic import BaseModel, Field, constr
+from fastapi import Body, FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel, Field, StringConstraints
 
 from babel.core import Locale
-from babel.numbers import format_currency, get_currency_name, UnknownCurrencyError
+from babel.numbers import format_currency, list_currencies
 
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
-from reportlab.pdfgen import canvas
 
 from mangum import Mangum
 
+from _fastpdf import PageWriter, TextBlock, line_op
 
-app = FastAPI(title="Guide Booker Invoice Generator", version="1.1.0")
+
+app = FastAPI(
+    title="Guide Booker Invoice Generator",
+    version="1.1.0",
+    default_response_class=ORJSONResponse,
+)
 
 
 CURRENCY_RE = re.compile(r"^[A-Z]{3}$")
 LOCALE_RE = re.compile(r"^[a-z]{2}(_[A-Z]{2})?$")
+DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+KNOWN_CURRENCIES = frozenset(list_currencies())
+MAX_BATCH_SIZE = 100
+
+
+NonEmptyStr = Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
 
 
 class InvoiceRequest(BaseModel):
-    booking_id: constr(strip_whitespace=True, min_length=1) = Field("bk_123456789", example="bk_123456789")
-    payment_id: constr(strip_whitespace=True, min_length=1) = Field("pay_987654321", example="pay_987654321")
+    booking_id: NonEmptyStr = Field("bk_123456789", examples=["bk_123456789"])
+    payment_id: NonEmptyStr = Field("pay_987654321", examples=["pay_987654321"])
 
-    customer_name: constr(strip_whitespace=True, min_length=1) = Field(..., example="John Doe")
-    guide_name: constr(strip_whitespace=True, min_length=1) = Field(..., example="Bali Explorer")
-    date: constr(strip_whitespace=True, min_length=1) = Field(..., example="2026-04-05")
+    customer_name: NonEmptyStr = Field(..., examples=["John Doe"])
+    guide_name: NonEmptyStr = Field(..., examples=["Bali Explorer"])
+    date: NonEmptyStr = Field(..., examples=["2026-04-05"])
 
-    price: float = Field(..., ge=0, example=150.00)
+    price: float = Field(..., ge=0, examples=[150.00])
 
-    currency: constr(strip_whitespace=True, min_length=3, max_length=3) = Field("USD", example="USD")
+    # Unknown currencies/locales fall back to USD/en_US in format_money rather than being rejected.
+    currency: Annotated[str, StringConstraints(strip_whitespace=True, min_length=3, max_length=3)] = Field(
+        "USD", examples=["USD"]
+    )
 
-    locale: constr(strip_whitespace=True, min_length=2, max_length=10) = Field("id_ID", example="en_US")
+    locale: Annotated[str, StringConstraints(strip_whitespace=True, min_length=2, max_length=10)] = Field(
+        "id_ID", examples=["en_US"]
+    )
+
+
+@functools.lru_cache(maxsize=4)
+def _issue_strings(epoch_second: int) -> tuple[str, str]:
+    """UTC offset and timestamp printed as the issue date, formatted once per second."""
+    # astimezone() without a zone resolves the system local time, including DST, for this instant.
+    local_dt = datetime.fromtimestamp(epoch_second, timezone.utc).astimezone()
+    return local_dt.strftime("%z"), local_dt.strftime("%Y-%m-%d %H:%M:%S")
 
 
 def _parse_booking_date(date_str: str):
-    try:
-        return datetime.strptime(date_str, "%Y-%m-%d").date()
-    except ValueError:
-        return date_str
+    # Fixed-position YYYY-MM-DD parse; strptime is far slower for this one shape.
+    year, month, day = date_str[0:4], date_str[5:7], date_str[8:10]
+    if (
+        len(date_str) == 10
+        and date_str.isascii()
+        and date_str[4] == "-"
+        and date_str[7] == "-"
+        and year.isdigit()
+        and month.isdigit()
+        and day.isdigit()
+    ):
+        try:
+            return date(int(year), int(month), int(day))
+        except ValueError:
+            pass
+    return date_str
 
 
 def _short_hash(value: str, length: int = 7) -> str:
@@ -53,12 +96,18 @@ def _short_hash(value: str, length: int = 7) -> str:
     return digest[:length]
 
 
-def build_invoice_number(booking_id: str, payment_id: str, booking_date: str) -> str:
+def build_invoice_number(booking_id: str, payment_id: str, booking_date: date | str) -> str:
     """
     Deterministic, traceable invoice number tied to booking/payment.
     Format: GB-INV-YYYYMMDD-BK<hash>-PY<hash>-<chk>
+    BK and PY hash only their own id, so every invoice of a booking (or payment) shares it.
+    Accepts the raw date string or the date already parsed by _parse_booking_date.
     """
-    date_compact = booking_date.replace("-", "") if re.match(r"^\d{4}-\d{2}-\d{2}$", booking_date) else "00000000"
+    if isinstance(booking_date, date):
+        # Not %Y: glibc does not zero-pad years below 1000.
+        date_compact = f"{booking_date.year:04d}{booking_date.month:02d}{booking_date.day:02d}"
+    else:
+        date_compact = booking_date.replace("-", "") if DATE_RE.match(booking_date) else "00000000"
 
     bk = _short_hash(booking_id, 7)
     py = _short_hash(payment_id, 7)
@@ -69,7 +118,22 @@ def build_invoice_number(booking_id: str, payment_id: str, booking_date: str) ->
     return f"GB-INV-{date_compact}-BK{bk}-PY{py}-{checksum}"
 
 
+@functools.lru_cache(maxsize=256)
+def _resolve_locale(locale_str: str) -> str:
+    try:
+        Locale.parse(locale_str)
+    except Exception:
+        return "en_US"
+    return locale_str
+
+
 def format_money(amount: float, currency: str, locale_str: str) -> str:
+    return _format_money_cached(amount, currency, locale_str)
+
+
+@functools.lru_cache(maxsize=1024)
+def _format_money_cached(amount: float, currency: str, locale_str: str) -> str:
+    # Keyed on the float amount itself so currencies with 3 minor digits are not truncated.
     currency = currency.strip().upper()
     locale_str = locale_str.strip()
 
@@ -79,103 +143,197 @@ def format_money(amount: float, currency: str, locale_str: str) -> str:
     if not LOCALE_RE.match(locale_str):
         locale_str = "en_US"
 
-    try:
-        Locale.parse(locale_str)
-    except Exception:
-        locale_str = "en_US"
+    locale_str = _resolve_locale(locale_str)
 
-    try:
-        _ = get_currency_name(currency, locale=locale_str)
-    except UnknownCurrencyError:
+    if currency not in KNOWN_CURRENCIES:
         currency = "USD"
 
     return format_currency(amount, currency, locale=locale_str)
 
 
-def generate_invoice_pdf(data: InvoiceRequest) -> bytes:
-    booking_date = _parse_booking_date(data.date)
-    issue_dt = datetime.now(timezone.utc)
-    local_dt = issue_dt.astimezone()
-
-    invoice_no = build_invoice_number(data.booking_id, data.payment_id, data.date)
-    amount_str = format_money(data.price, data.currency, data.locale)
-
-    buffer = BytesIO()
-    width, height = A4
-    c = canvas.Canvas(buffer, pagesize=A4)
-
-    margin_x = 18 * mm
-    top_y = height - 18 * mm
+# Page geometry, shared by the static template and the per-request layer.
+_PAGE_W, _PAGE_H = A4
+_MARGIN_X = 18 * mm
+_RIGHT_X = _PAGE_W - _MARGIN_X
+_AMOUNT_LABEL_X = _RIGHT_X - 120
+_TOP_Y = _PAGE_H - 18 * mm
+_META_Y = _TOP_Y - 45
+_BILL_Y = _META_Y - 120
+_TABLE_Y = _BILL_Y - 60
+_TOTAL_Y = _TABLE_Y - 70
+_FOOTER_Y = 28 * mm
 
-    c.setFont("Helvetica-Bold", 18)
-    c.drawString(margin_x, top_y, "INVOICE")
 
-    c.setFont("Helvetica", 10)
-    c.drawRightString(width - margin_x, top_y + 2, "Guide Booker")
-    c.drawRightString(width - margin_x, top_y - 12, "Invoice PDF Generator Service")
-
-    c.setLineWidth(1)
-    c.line(margin_x, top_y - 22, width - margin_x, top_y - 22)
-
-    meta_y = top_y - 45
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(margin_x, meta_y, "Invoice Details")
-    c.setFont("Helvetica", 10)
-
-    c.drawString(margin_x, meta_y - 18, f"Invoice No: {invoice_no}")
-    c.drawString(margin_x, meta_y - 34, f"Issue Date (UTC{local_dt:%z}): {local_dt.strftime('%Y-%m-%d %H:%M:%S')}")
-    c.drawString(margin_x, meta_y - 50, f"Booking Date: {booking_date}")
-
-    # c.drawString(margin_x, meta_y - 70, f"Booking ID: {data.booking_id}")
-    # c.drawString(margin_x, meta_y - 86, f"Payment ID: {data.payment_id}")
-
-    bill_y = meta_y - 120
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(margin_x, bill_y, "Bill To")
-    c.setFont("Helvetica", 10)
-    c.drawString(margin_x, bill_y - 18, data.customer_name)
-
-    table_y = bill_y - 60
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(margin_x, table_y, "Service")
-    c.drawString(width - margin_x - 120, table_y, "Amount")
-
-    c.setLineWidth(0.8)
-    c.line(margin_x, table_y - 8, width - margin_x, table_y - 8)
-
-    c.setFont("Helvetica", 10)
-    c.drawString(margin_x, table_y - 28, f"Guided Tour: {data.guide_name}")
-    c.drawRightString(width - margin_x, table_y - 28, amount_str)
-
-    total_y = table_y - 70
-    c.setLineWidth(0.8)
-    c.line(margin_x, total_y + 12, width - margin_x, total_y + 12)
-
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(margin_x, total_y - 2, "TOTAL")
-    c.drawRightString(width - margin_x, total_y - 2, amount_str)
-
-    footer_y = 28 * mm
-    c.setFont("Helvetica", 9)
-    c.drawString(margin_x, footer_y, "Thank you for your booking!")
-    c.setFont("Helvetica-Oblique", 8)
-    c.drawString(margin_x, footer_y - 12, "This invoice was generated automatically.")
-
-    c.showPage()
-    c.save()
+def _build_static_template() -> bytes:
+    """
+    PDF operators for everything on the invoice that does not depend on the request:
+    header, labels, rules and footer. Built once at import and stamped onto every page.
+    """
+    # Strings are grouped by font and size so each Tf is only emitted once.
+    text = TextBlock()
+    text.add("Helvetica-Bold", 18, _MARGIN_X, _TOP_Y, "INVOICE")
+    text.add("Helvetica-Bold", 11, _MARGIN_X, _META_Y, "Invoice Details")
+    text.add("Helvetica-Bold", 11, _MARGIN_X, _BILL_Y, "Bill To")
+    text.add("Helvetica-Bold", 11, _MARGIN_X, _TABLE_Y, "Service")
+    text.add("Helvetica-Bold", 11, _AMOUNT_LABEL_X, _TABLE_Y, "Amount")
+    text.add("Helvetica-Bold", 12, _MARGIN_X, _TOTAL_Y - 2, "TOTAL")
+    text.add("Helvetica", 10, _RIGHT_X, _TOP_Y + 2, "Guide Booker", right=True)
+    text.add("Helvetica", 10, _RIGHT_X, _TOP_Y - 12, "Invoice PDF Generator Service", right=True)
+    text.add("Helvetica", 9, _MARGIN_X, _FOOTER_Y, "Thank you for your booking!")
+    text.add("Helvetica-Oblique", 8, _MARGIN_X, _FOOTER_Y - 12, "This invoice was generated automatically.")
+
+    return b"\n".join([
+        line_op(1, _MARGIN_X, _TOP_Y - 22, _RIGHT_X, _TOP_Y - 22),
+        line_op(0.8, _MARGIN_X, _TABLE_Y - 8, _RIGHT_X, _TABLE_Y - 8),
+        line_op(0.8, _MARGIN_X, _TOTAL_Y + 12, _RIGHT_X, _TOTAL_Y + 12),
+        text.getvalue(),
+    ])
+
+
+_STATIC_TEMPLATE = _build_static_template()
+_PAGE = PageWriter(A4)
 
-    pdf_bytes = buffer.getvalue()
-    buffer.close()
-    return pdf_bytes
 
+def generate_invoice_pdf(data: InvoiceRequest) -> bytes:
+    """
+    Render the invoice PDF for a request.
+    Re-downloads of the same invoice within the same minute reuse the cached bytes.
+    """
+    return _generate_invoice_pdf_cached(
+        data.booking_id,
+        data.payment_id,
+        data.customer_name,
+        data.guide_name,
+        data.date,
+        data.price,
+        data.currency,
+        data.locale,
+        int(time.time() // 60),
+    )
+
+
+@functools.lru_cache(maxsize=512)
+def _generate_invoice_pdf_cached(
+    booking_id: str,
+    payment_id: str,
+    customer_name: str,
+    guide_name: str,
+    date_str: str,
+    price: float,
+    currency: str,
+    locale: str,
+    issue_minute: int,
+) -> bytes:
+    # issue_minute only buckets the cache key; the printed issue date is the time of first render.
+    booking_date = _parse_booking_date(date_str)
+    utc_offset, issued_at = _issue_strings(int(time.time()))
+
+    invoice_no = build_invoice_number(booking_id, payment_id, booking_date)
+    amount_str = format_money(price, currency, locale)
+
+    text = TextBlock()
+    text.add("Helvetica", 10, _MARGIN_X, _META_Y - 18, f"Invoice No: {invoice_no}")
+    text.add("Helvetica", 10, _MARGIN_X, _META_Y - 34, f"Issue Date (UTC{utc_offset}): {issued_at}")
+    text.add("Helvetica", 10, _MARGIN_X, _META_Y - 50, f"Booking Date: {booking_date}")
+    # text.add("Helvetica", 10, _MARGIN_X, _META_Y - 70, f"Booking ID: {booking_id}")
+    # text.add("Helvetica", 10, _MARGIN_X, _META_Y - 86, f"Payment ID: {payment_id}")
+    text.add("Helvetica", 10, _MARGIN_X, _BILL_Y - 18, customer_name)
+    text.add("Helvetica", 10, _MARGIN_X, _TABLE_Y - 28, f"Guided Tour: {guide_name}")
+    text.add("Helvetica", 10, _RIGHT_X, _TABLE_Y - 28, amount_str, right=True)
+    text.add("Helvetica-Bold", 12, _RIGHT_X, _TOTAL_Y - 2, amount_str, right=True)
+
+    content = _STATIC_TEMPLATE + b"\n" + text.getvalue()
+    return _PAGE.render(content)
+
+
+def _warm_up() -> None:
+    """
+    Load Babel's CLDR data and run one render at import, so Lambda's cold start absorbs
+    the lazy loading instead of the first request.
+    """
+    Locale.parse("en_US")
+    Locale.parse("id_ID")
+    format_currency(0, "USD", locale="en_US")
+    format_currency(0, "IDR", locale="id_ID")
+    generate_invoice_pdf(InvoiceRequest(customer_name="_", guide_name="_", date="2000-01-01", price=0.0))
+
+
+_warm_up()
+
+
+def _invoice_filename(booking_id: str) -> str:
+    # Path separators and ".." are replaced so zip entries cannot escape the extraction dir.
+    name = booking_id.strip().replace(" ", "_").replace("/", "_").replace("\\", "_")
+    while ".." in name:
+        name = name.replace("..", "_")
+    return f"invoice_{name}.pdf"
+
+
+def _build_invoice_zip(reqs: list[InvoiceRequest]) -> bytes:
+    pdfs = [generate_invoice_pdf(req) for req in reqs]
+
+    used: set[str] = set()
+    stream = BytesIO()
+    # PDFs are already compact, so entries are stored rather than deflated again.
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_STORED) as zf:
+        for req, pdf_bytes in zip(reqs, pdfs):
+            filename = _invoice_filename(req.booking_id)
+            stem, n = filename[:-len(".pdf")], 1
+            while filename in used:
+                n += 1
+                filename = f"{stem}_{n}.pdf"
+            used.add(filename)
+            zf.writestr(filename, pdf_bytes)
+
+    return stream.getvalue()
+
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    # FastAPI's built-in handler always uses JSONResponse; send 422s through orjson as well.
+    return ORJSONResponse(status_code=422, content={"detail": jsonable_encoder(exc.errors())})
+
+
+@app.post(
+    "/generate-invoice",
+    response_model=None,
+    response_class=Response,
+    responses={200: {"content": {"application/pdf": {}}}},
+)
+async def generate_invoice(req: InvoiceRequest):
+    # Cache misses (and the first use of a locale, which loads its CLDR data) take long
+    # enough to stall other requests, so render on the default thread pool, like the batch route.
+    loop = asyncio.get_running_loop()
+    pdf_bytes = await loop.run_in_executor(None, generate_invoice_pdf, req)
+
+    filename = _invoice_filename(req.booking_id)
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Content-Length": str(len(pdf_bytes)),
+        # Marks the body as final so compression middleware/proxies leave it alone.
+        "Content-Encoding": "identity",
+    }
 
-@app.post("/generate-invoice")
-def generate_invoice(req: InvoiceRequest):
-    pdf_bytes = generate_invoice_pdf(req)
+    return Response(content=pdf_bytes, media_type="application/pdf", headers=headers)
 
-    filename = f"invoice_{req.booking_id.strip().replace(' ', '_')}.pdf"
-    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
 
-    return Response(content=pdf_bytes, media_type="application/pdf", headers=headers)
+@app.post(
+    "/generate-invoice/batch",
+    response_model=None,
+    response_class=Response,
+    responses={200: {"content": {"application/zip": {}}}},
+)
+async def generate_invoice_batch(reqs: Annotated[list[InvoiceRequest], Body(max_length=MAX_BATCH_SIZE)]):
+    # Up to MAX_BATCH_SIZE renders plus zipping can add up to milliseconds; keep them off the loop.
+    loop = asyncio.get_running_loop()
+    zip_bytes = await loop.run_in_executor(None, _build_invoice_zip, reqs)
+
+    headers = {
+        "Content-Disposition": 'attachment; filename="invoices.zip"',
+        "Content-Length": str(len(zip_bytes)),
+        "Content-Encoding": "identity",
+    }
+
+    return Response(content=zip_bytes, media_type="application/zip", headers=headers)
 
 handler = Mangum(app)
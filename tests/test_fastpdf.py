@@ -0,0 +1,57 @@
+import re
+
+from reportlab.lib.pagesizes import A4
+
+from _fastpdf import PageWriter, TextBlock
+
+
+def _text(*args, **kwargs) -> bytes:
+    text = TextBlock()
+    text.add(*args, **kwargs)
+    return text.getvalue()
+
+
+def test_render_writes_consistent_xref_offsets():
+    pdf = PageWriter(A4).render(_text("Helvetica", 10, 50, 700, "Hello"))
+
+    assert pdf[:5] == b"%PDF-"
+    assert pdf.endswith(b"%%EOF\n")
+
+    startxref = int(pdf.rsplit(b"startxref\n", 1)[1].split(b"\n", 1)[0])
+    assert pdf[startxref:startxref + 5] == b"xref\n"
+
+    offsets = re.findall(rb"(\d{10}) 00000 n \n", pdf)
+    for num, offset in enumerate(offsets, start=1):
+        assert pdf[int(offset):].startswith(b"%d 0 obj\n" % num)
+
+
+def test_render_sets_content_stream_length():
+    content = _text("Helvetica-Bold", 12, 50, 700, "TOTAL")
+    pdf = PageWriter(A4).render(content)
+
+    assert b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content) in pdf
+
+
+def test_text_block_escapes_literal_and_replaces_unencodable_chars():
+    op = _text("Helvetica", 10, 0, 0, "Jö (a\\b) 好")
+
+    assert b"(J\xf6 \\(a\\\\b\\) ?) Tj" in op
+
+
+def test_text_block_only_switches_font_when_it_changes():
+    text = TextBlock()
+    text.add("Helvetica", 10, 0, 0, "a")
+    text.add("Helvetica", 10, 0, 10, "b")
+    text.add("Helvetica-Bold", 10, 0, 20, "c")
+    text.add("Helvetica-Bold", 12, 0, 30, "d")
+
+    ops = text.getvalue()
+    assert ops.startswith(b"BT\n") and ops.endswith(b"\nET")
+    assert ops.count(b" Tf") == 3
+    assert ops.count(b" Tj") == 4
+
+
+def test_text_block_maps_thin_space_group_separators_to_spaces():
+    op = _text("Helvetica", 10, 0, 0, "1\u202f500,00\xa0\u20ac and 2\u2009000")
+
+    assert b"(1 500,00\xa0\x80 and 2 000) Tj" in op
@@ -1,8 +1,18 @@
 import re
+import time
+import zipfile
+from datetime import date
+from io import BytesIO
+
+from reportlab.lib.rl_accel import fp_str
+from reportlab.pdfbase import pdfmetrics
 
 import pytest
 from fastapi.testclient import TestClient
+import app as app_module
 from app import (
+    MAX_BATCH_SIZE,
+    _parse_booking_date,
     app,
     build_invoice_number,
     format_money,
@@ -37,11 +47,65 @@ def test_build_invoice_number_is_deterministic_and_well_formed():
     assert re.fullmatch(r"GB-INV-\d{8}-BK[A-F0-9]{7}-PY[A-F0-9]{7}-[A-F0-9]{4}", inv1)
 
 
+def test_build_invoice_number_matches_previously_issued_numbers():
+    # Issued numbers are stored by customers and accounting; the scheme must not drift.
+    assert build_invoice_number("bk_123456789", "pay_987654321", "2026-04-05") == (
+        "GB-INV-20260405-BKCDB52A9-PYAF769D0-DCEF"
+    )
+    assert build_invoice_number("bk_1", "pay_1", "2026-04-05") == "GB-INV-20260405-BK598B7E9-PY6EC8111-DD14"
+
+
+def test_build_invoice_number_changes_with_each_field():
+    base = build_invoice_number("bk_123", "pay_456", "2026-04-05")
+
+    assert build_invoice_number("bk_124", "pay_456", "2026-04-05") != base
+    assert build_invoice_number("bk_123", "pay_457", "2026-04-05") != base
+    assert build_invoice_number("bk_123", "pay_456", "2026-04-06") != base
+
+
+def test_build_invoice_number_segments_trace_booking_and_payment():
+    same_booking = [build_invoice_number("bk_1", pay, "2026-04-05") for pay in ("pay_1", "pay_2")]
+    same_payment = [build_invoice_number(bk, "pay_1", d) for bk, d in (("bk_1", "2026-04-05"), ("bk_2", "2026-04-06"))]
+
+    assert same_booking[0].split("-")[3] == same_booking[1].split("-")[3]
+    assert same_booking[0].split("-")[4] != same_booking[1].split("-")[4]
+    assert same_payment[0].split("-")[4] == same_payment[1].split("-")[4]
+    assert same_payment[0].split("-")[3] != same_payment[1].split("-")[3]
+
+
 def test_build_invoice_number_invalid_date_uses_zeros():
     inv = build_invoice_number("bk_123", "pay_456", "not-a-date")
     assert inv.startswith("GB-INV-00000000-")
 
 
+def test_build_invoice_number_accepts_parsed_date():
+    assert build_invoice_number("bk_123", "pay_456", date(2026, 4, 5)) == build_invoice_number(
+        "bk_123", "pay_456", "2026-04-05"
+    )
+
+
+@pytest.mark.parametrize("raw", ["2026-04-+5", "2026-04- 5", "2_26-04-05", "+026-04-05", "2026-04-\u0665\u0665"])
+def test_parse_booking_date_rejects_non_ascii_digit_fields(raw):
+    assert _parse_booking_date(raw) == raw
+
+
+@pytest.mark.parametrize(
+    "raw,expected_prefix",
+    [
+        ("2026-04-+5", "GB-INV-00000000-"),
+        ("2026-04- 5", "GB-INV-00000000-"),
+        ("2_26-04-05", "GB-INV-00000000-"),
+        ("+026-04-05", "GB-INV-00000000-"),
+        ("0026-04-05", "GB-INV-00260405-"),
+    ],
+)
+def test_build_invoice_number_from_parsed_date_keeps_eight_digit_date(raw, expected_prefix):
+    inv = build_invoice_number("bk_123", "pay_456", _parse_booking_date(raw))
+
+    assert inv.startswith(expected_prefix)
+    assert re.fullmatch(r"GB-INV-\d{8}-BK[A-F0-9]{7}-PY[A-F0-9]{7}-[A-F0-9]{4}", inv)
+
+
 def test_format_money_valid():
     s = format_money(150.0, "USD", "en_US")
     assert "150" in s
@@ -52,6 +116,10 @@ def test_format_money_invalid_currency_falls_back_to_usd():
     assert "150" in s
 
 
+def test_format_money_unknown_currency_code_falls_back_to_usd():
+    assert format_money(150.0, "QQQ", "en_US") == format_money(150.0, "USD", "en_US")
+
+
 def test_format_money_invalid_currency_format_falls_back_to_usd():
     s = format_money(150.0, "US", "en_US")
     assert "150" in s
@@ -71,6 +139,26 @@ def test_generate_invoice_pdf_returns_pdf_bytes():
     assert pdf_bytes[:5] == b"%PDF-"
 
 
+def test_generate_invoice_pdf_contains_dynamic_content():
+    req = InvoiceRequest(**sample_request_payload())
+    pdf_bytes = generate_invoice_pdf(req)
+    invoice_no = build_invoice_number(req.booking_id, req.payment_id, req.date)
+
+    assert f"(Invoice No: {invoice_no}) Tj".encode() in pdf_bytes
+    assert b"(Booking Date: 2026-04-05) Tj" in pdf_bytes
+    assert b"(John Doe) Tj" in pdf_bytes
+    assert b"(Guided Tour: Bali Explorer) Tj" in pdf_bytes
+    assert pdf_bytes.count(b"($150.00) Tj") == 2
+
+    # The amount column is right-aligned to the page margin in both fonts.
+    for font, size, y in (
+        ("Helvetica", 10, app_module._TABLE_Y - 28),
+        ("Helvetica-Bold", 12, app_module._TOTAL_Y - 2),
+    ):
+        x = app_module._RIGHT_X - pdfmetrics.stringWidth("$150.00", font, size)
+        assert b"1 0 0 1 %s Tm ($150.00) Tj" % fp_str(x, y).encode() in pdf_bytes
+
+
 def test_generate_invoice_endpoint_returns_pdf_and_headers():
     payload = sample_request_payload()
     resp = client.post("/generate-invoice", json=payload)
@@ -83,6 +171,9 @@ def test_generate_invoice_endpoint_returns_pdf_and_headers():
     assert "attachment" in cd.lower()
     assert 'filename="invoice_bk_123456789.pdf"' in cd
 
+    assert resp.headers["content-length"] == str(len(resp.content))
+    assert resp.headers["content-encoding"] == "identity"
+
 
 def test_generate_invoice_endpoint_validation_error_missing_required():
     payload = sample_request_payload()
@@ -90,6 +181,8 @@ def test_generate_invoice_endpoint_validation_error_missing_required():
     resp = client.post("/generate-invoice", json=payload)
 
     assert resp.status_code == 422
+    assert resp.headers["content-type"].startswith("application/json")
+    assert resp.json()["detail"][0]["loc"] == ["body", "customer_name"]
 
 
 def test_generate_invoice_endpoint_with_weird_spaces_in_booking_id_filename_sanitized():
@@ -101,6 +194,55 @@ def test_generate_invoice_endpoint_with_weird_spaces_in_booking_id_filename_sani
     assert 'filename="invoice_bk_123_456.pdf"' in cd
 
 
+def test_generate_invoice_batch_endpoint_returns_zip_of_pdfs():
+    payload = [
+        sample_request_payload(booking_id="bk_1"),
+        sample_request_payload(booking_id="bk_2", currency="IDR", locale="id_ID"),
+        sample_request_payload(booking_id="bk_1", price=99.0),
+    ]
+    resp = client.post("/generate-invoice/batch", json=payload)
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/zip")
+    assert 'filename="invoices.zip"' in resp.headers.get("content-disposition", "")
+
+    with zipfile.ZipFile(BytesIO(resp.content)) as zf:
+        assert zf.namelist() == ["invoice_bk_1.pdf", "invoice_bk_2.pdf", "invoice_bk_1_2.pdf"]
+        for name in zf.namelist():
+            assert zf.read(name)[:5] == b"%PDF-"
+
+
+def test_generate_invoice_batch_endpoint_never_repeats_entry_names():
+    payload = [sample_request_payload(booking_id=bk) for bk in ("bk_1", "bk_1", "bk_1_2")]
+    resp = client.post("/generate-invoice/batch", json=payload)
+
+    with zipfile.ZipFile(BytesIO(resp.content)) as zf:
+        assert zf.namelist() == ["invoice_bk_1.pdf", "invoice_bk_1_2.pdf", "invoice_bk_1_2_2.pdf"]
+
+
+def test_generate_invoice_batch_endpoint_sanitizes_entry_paths():
+    payload = [sample_request_payload(booking_id="../../etc/x"), sample_request_payload(booking_id="a\\b")]
+    resp = client.post("/generate-invoice/batch", json=payload)
+
+    with zipfile.ZipFile(BytesIO(resp.content)) as zf:
+        for name in zf.namelist():
+            assert "/" not in name and "\\" not in name and ".." not in name[:-len(".pdf")]
+
+
+def test_generate_invoice_batch_endpoint_rejects_oversized_batch():
+    payload = [sample_request_payload()] * (MAX_BATCH_SIZE + 1)
+    resp = client.post("/generate-invoice/batch", json=payload)
+
+    assert resp.status_code == 422
+
+
+def test_generate_invoice_batch_endpoint_validation_error():
+    payload = [sample_request_payload(), sample_request_payload(price=-1)]
+    resp = client.post("/generate-invoice/batch", json=payload)
+
+    assert resp.status_code == 422
+
+
 @pytest.mark.parametrize(
     "currency,locale",
     [
@@ -117,3 +259,29 @@ def test_generate_invoice_endpoint_various_currency_locale(currency, locale):
 
     assert resp.status_code == 200
     assert resp.content[:5] == b"%PDF-"
+
+
+def test_generate_invoice_pdf_reuses_cached_bytes_within_same_minute(monkeypatch):
+    monkeypatch.setattr("app.time.time", lambda: 1_800_000_000.0)
+    req = InvoiceRequest(**sample_request_payload(booking_id="bk_cached"))
+
+    first = generate_invoice_pdf(req)
+    second = generate_invoice_pdf(InvoiceRequest(**sample_request_payload(booking_id="bk_cached")))
+
+    assert first is second
+
+
+@pytest.fixture
+def berlin_local_time(monkeypatch):
+    monkeypatch.setenv("TZ", "Europe/Berlin")
+    time.tzset()
+    app_module._issue_strings.cache_clear()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+    app_module._issue_strings.cache_clear()
+
+
+def test_issue_strings_follow_the_local_dst_offset_of_that_instant(berlin_local_time):
+    assert app_module._issue_strings(1_782_000_000) == ("+0200", "2026-06-21 02:00:00")
+    assert app_module._issue_strings(1_767_000_000) == ("+0100", "2025-12-29 10:20:00")